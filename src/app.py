@@ -1,17 +1,68 @@
+import asyncio
 import os
+from contextlib import asynccontextmanager
+from typing import Optional
+
+import httpx
 import openai
 import dotenv
+
+# Load .env before importing modules that read their settings from the environment
+dotenv.load_dotenv()
+
+from chromadb.errors import ChromaError
 from fastapi import FastAPI
-from pydantic import BaseModel
-from query_vector_db import retrieve  # Assuming retrieve is in query_vector_db.py
+from fastapi.responses import JSONResponse, ORJSONResponse, PlainTextResponse
+from pydantic import BaseModel, Field, field_validator
+from embedding_batcher import EmbeddingBatcher
+from metrics import TRACING_ENABLED, render_prometheus, stage_timer
+from retrieval_backends import validate_where
+from query_vector_db import (
+    EMBEDDING_MODEL,
+    close_client,
+    get_embedding_cache,
+    get_semantic_cache,
+    retrieve_async,
+    retrieve_batch_async,
+    warm_up,
+)
 
 from fastapi.middleware.cors import CORSMiddleware
 
 
+# Maximum number of /retrieve requests a single worker processes at the same time
+RETRIEVE_CONCURRENCY = int(os.getenv("RETRIEVE_CONCURRENCY", "256"))
+# Concurrent embedding requests are coalesced for up to EMBEDDING_BATCH_WAIT_MS
+# or until EMBEDDING_BATCH_SIZE queries are waiting, whichever comes first
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+EMBEDDING_BATCH_WAIT_MS = float(os.getenv("EMBEDDING_BATCH_WAIT_MS", "5"))
+# Limits on a single /retrieve/batch request
+MAX_BATCH_QUERIES = int(os.getenv("MAX_BATCH_QUERIES", "256"))
+MAX_RESULTS_PER_QUERY = int(os.getenv("MAX_RESULTS_PER_QUERY", "50"))
+# Longest query accepted, in characters; OpenAI rejects inputs beyond 8191 tokens
+MAX_QUERY_LENGTH = int(os.getenv("MAX_QUERY_LENGTH", "2000"))
 
 
-dotenv.load_dotenv()
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Open the embedding cache and the retrieval backend, and load its index, before serving traffic
+    try:
+        warm_up()
+    except (ChromaError, OSError) as e:
+        # The index may not be populated yet; it is opened lazily on first request
+        print(f"Vector DB warm-up skipped: {e}")
+    yield
+    await openai_client.close()
+    close_client()
+
+
+app = FastAPI(lifespan=lifespan)
+
+if TRACING_ENABLED:
+    # Request spans; the per-stage spans from metrics.stage_timer() nest under them
+    from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
+
+    FastAPIInstrumentor.instrument_app(app, excluded_urls="metrics")
 
 app.add_middleware(
     CORSMiddleware,
@@ -24,15 +75,101 @@ app.add_middleware(
 
 # Define a Pydantic model for the request body
 class QueryRequest(BaseModel):
-    query: str
+    query: str = Field(..., min_length=1, max_length=MAX_QUERY_LENGTH)
+
+
+class BatchQuery(BaseModel):
+    query: str = Field(..., min_length=1, max_length=MAX_QUERY_LENGTH)
+    k: int = Field(1, ge=1, le=MAX_RESULTS_PER_QUERY)  # Number of ranked results to return
+    min_similarity: Optional[float] = Field(None, ge=-1.0, le=1.0)  # Minimum cosine similarity
+    where: Optional[dict] = None  # ChromaDB metadata filter, e.g. {"idx": "4"}
 
+    @field_validator("where")
+    @classmethod
+    def check_where(cls, where: Optional[dict]) -> Optional[dict]:
+        # Reject malformed filters with a 422 instead of failing inside the vector query
+        if where:
+            validate_where(where)
+        return where
 
-# Initialize OpenAI client
-openai_client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+class BatchQueryRequest(BaseModel):
+    queries: list[BatchQuery] = Field(..., min_length=1, max_length=MAX_BATCH_QUERIES)
+
+
+# Initialize async OpenAI client with a connection pool sized for the concurrency limit
+openai_client = openai.AsyncOpenAI(
+    api_key=os.getenv("OPENAI_API_KEY"),
+    http_client=openai.DefaultAsyncHttpxClient(
+        limits=httpx.Limits(
+            max_connections=RETRIEVE_CONCURRENCY,
+            max_keepalive_connections=RETRIEVE_CONCURRENCY,
+        )
+    ),
+)
+
+# Shared coalescer in front of the embeddings API
+embedding_batcher = EmbeddingBatcher(
+    openai_client,
+    EMBEDDING_MODEL,
+    max_batch_size=EMBEDDING_BATCH_SIZE,
+    max_wait=EMBEDDING_BATCH_WAIT_MS / 1000,
+)
+
+# Requests beyond the concurrency limit wait here instead of piling onto OpenAI and ChromaDB
+retrieve_semaphore = asyncio.Semaphore(RETRIEVE_CONCURRENCY)
 
 
 @app.post("/retrieve")
 async def retrieve_endpoint(request: QueryRequest):
-    # Call the retrieve function with the query from the request
-    contexts, metadata = retrieve(request.query, openai_client)
-    return {"contexts": contexts, "metadata": metadata}
+    with stage_timer("retrieve_total"):
+        # Call the retrieve function with the query from the request
+        with stage_timer("queue"):
+            await retrieve_semaphore.acquire()
+        try:
+            contexts, metadata = await retrieve_async(request.query, openai_client, embedding_batcher)
+        finally:
+            retrieve_semaphore.release()
+        with stage_timer("serialization"):
+            return JSONResponse({"contexts": contexts, "metadata": metadata})
+
+
+@app.post("/retrieve/batch", response_class=ORJSONResponse)
+async def retrieve_batch_endpoint(request: BatchQueryRequest):
+    with stage_timer("retrieve_batch_total"):
+        # Embed all queries in one call and answer them with one vector query per filter
+        with stage_timer("queue"):
+            await retrieve_semaphore.acquire()
+        try:
+            results = await retrieve_batch_async(
+                [query.model_dump() for query in request.queries], openai_client
+            )
+        finally:
+            retrieve_semaphore.release()
+        with stage_timer("serialization"):
+            return ORJSONResponse({"results": results})
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    # Prometheus text format: per-stage latency histograms plus cache and batching counters
+    embedding_cache = get_embedding_cache().stats()
+    semantic_cache = get_semantic_cache()
+    semantic_stats = semantic_cache.stats() if semantic_cache is not None else {"hits": 0, "misses": 0}
+    counters = {
+        "embedding_cache_lookups_total": (
+            "Query embedding cache lookups by outcome.",
+            [
+                ({"result": "memory_hit"}, embedding_cache["hits_memory"]),
+                ({"result": "disk_hit"}, embedding_cache["hits_disk"]),
+                ({"result": "miss"}, embedding_cache["misses"]),
+            ],
+        ),
+        "semantic_cache_lookups_total": (
+            "Semantic result cache lookups by outcome.",
+            [({"result": "hit"}, semantic_stats["hits"]), ({"result": "miss"}, semantic_stats["misses"])],
+        ),
+        "embedding_batches_total": ("Batched embedding API calls.", [({}, embedding_batcher.batches)]),
+        "embedding_batch_items_total": ("Queries sent in batched embedding calls.", [({}, embedding_batcher.items)]),
+    }
+    return PlainTextResponse(render_prometheus(counters), media_type="text/plain; version=0.0.4")
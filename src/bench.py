@@ -0,0 +1,165 @@
+"""
+Replays a query log against the app and reports latency per retrieval stage.
+
+The app runs in-process behind an httpx ASGI transport, with its OpenAI client pointed at
+a local fake embedding server, so the numbers cover everything except the real network
+round trip to OpenAI (emulated by --latency-ms). Every stage timed by metrics.stage_timer()
+is reported with its p50/p95/p99 latency and throughput, next to the end-to-end latency
+seen by the client.
+
+The query log is a text file with one query per line, or a JSONL file whose lines hold a
+"query" field (e.g. exported request logs).
+
+Usage:
+    python bench.py queries.txt --repeat 5 --concurrency 20 --latency-ms 50
+    python bench.py queries.jsonl --docs 1000  # Against a scratch collection of random vectors
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import tempfile
+import time
+
+from fake_embedding_server import FakeEmbeddingServer
+
+
+def load_queries(path: str) -> list[str]:
+    """
+    Reads the queries of a log file, skipping blank lines.
+    """
+    queries = []
+    with open(path, "r", encoding="utf-8") as file:
+        for line in file:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("{"):
+                line = json.loads(line)["query"]
+            queries.append(line)
+    return queries
+
+
+async def replay(queries: list[str], concurrency: int) -> tuple[list[float], float]:
+    """
+    Sends every query to POST /retrieve with at most `concurrency` in flight.
+
+    Returns:
+        tuple: End-to-end latencies in seconds, wall-clock duration of the replay
+    """
+    import httpx
+
+    from app import app
+
+    # ASGITransport does not run the lifespan hook, so enter it here (warm-up and shutdown)
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            return await send_queries(client, queries, concurrency)
+
+
+async def send_queries(client, queries: list[str], concurrency: int) -> tuple[list[float], float]:
+    """
+    Sends every query to POST /retrieve through an httpx.AsyncClient, with at most
+    `concurrency` in flight.
+
+    Returns:
+        tuple: Latency of every request in seconds, wall-clock duration of the run
+    """
+    latencies = []
+    gate = asyncio.Semaphore(concurrency)
+
+    async def one(query: str):
+        async with gate:
+            started = time.perf_counter()
+            response = await client.post("/retrieve", json={"query": query})
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(query) for query in queries))
+    return latencies, time.perf_counter() - started
+
+
+def percentiles(values: list[float]) -> tuple[float, float, float]:
+    """
+    Returns the nearest-rank p50, p95 and p99 of the values: the smallest value that at least
+    that share of the values does not exceed, with no interpolation.
+    """
+    values = sorted(values)
+    return tuple(values[max(math.ceil(p / 100 * len(values)), 1) - 1] for p in (50, 95, 99))
+
+
+def print_header(label: str = "stage") -> None:
+    print(f"{label:<22} {'count':>7} {'per s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+
+
+def report(label: str, values: list[float], elapsed: float) -> None:
+    """
+    Prints one table row: count, throughput and latency percentiles of the values.
+    """
+    p50, p95, p99 = percentiles(values)
+    print(
+        f"{label:<22} {len(values):>7} {len(values) / elapsed:>9.1f} "
+        f"{p50 * 1000:>9.2f} {p95 * 1000:>9.2f} {p99 * 1000:>9.2f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a query log and report per-stage retrieval latency.")
+    parser.add_argument("query_log", help="Text file with one query per line, or JSONL with a 'query' field")
+    parser.add_argument("--repeat", type=int, default=1, help="Times to replay the log")
+    parser.add_argument("--concurrency", type=int, default=20, help="Requests in flight")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="Fake embedding latency")
+    parser.add_argument("--dimensions", type=int, default=1536, help="Embedding size")
+    parser.add_argument(
+        "--docs", type=int, default=0, help="Seed a scratch collection with this many random vectors instead of using VECTOR_DB_PATH"
+    )
+    args = parser.parse_args()
+
+    queries = load_queries(args.query_log) * args.repeat
+    if not queries:
+        raise SystemExit(f"No queries found in {args.query_log}")
+
+    server = FakeEmbeddingServer(latency=args.latency_ms / 1000, dimensions=args.dimensions).start()
+
+    # Point every module at the fake server before they are imported
+    os.environ["OPENAI_BASE_URL"] = server.base_url
+    os.environ["OPENAI_API_KEY"] = "bench"
+    os.environ["RETRIEVE_CONCURRENCY"] = str(args.concurrency)
+    os.environ["EMBEDDING_CACHE_PATH"] = ""  # Keep the persistent cache out of the measurement
+    import metrics
+
+    metrics.record_samples()
+    scratch = None
+    try:
+        if args.docs:
+            from bench_retrieve_load import seed_collection
+
+            scratch = tempfile.TemporaryDirectory(prefix="bb_bench_")
+            os.environ["VECTOR_DB_PATH"] = scratch.name
+            seed_collection(args.docs, args.dimensions)
+        latencies, elapsed = asyncio.run(replay(queries, args.concurrency))
+    finally:
+        server.stop()
+        if scratch is not None:
+            scratch.cleanup()
+
+    print(
+        f"{len(queries)} requests, concurrency {args.concurrency}, "
+        f"embedding latency {args.latency_ms:.0f} ms, {elapsed:.2f} s"
+    )
+    print_header()
+    # Stages in the order a request goes through them; stages that never ran are skipped
+    stages = metrics.samples()
+    order = ["queue", "embedding_cache", "embedding", "semantic_cache", "client_setup", "vector_query", "serialization", "retrieve_total"]
+    for stage in order + sorted(set(stages) - set(order)):
+        if stages.get(stage):
+            report(stage, stages[stage], elapsed)
+    report("end_to_end", latencies, elapsed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Latency and recall benchmark of the retrieval backends on synthetic embeddings.
+
+For every collection size, clustered random vectors are written to a throwaway ChromaDB
+collection and exported for the numpy backend. Both backends then answer the same queries
+(noisy copies of stored vectors) one at a time and in batches. Recall@k is measured against
+an exact float64 brute-force search.
+
+Usage:
+    python bench_backends.py --sizes 1000,100000,1000000 --dimensions 256 --queries 200 --k 10
+
+1M vectors of 1536 dimensions take about 6 GB as float32, and loading them into ChromaDB
+takes a long time; lower --dimensions to keep the large runs manageable.
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+import chromadb
+import numpy as np
+
+from bench import percentiles
+from retrieval_backends import ChromaBackend, NumpyBackend, bump_generation, export_numpy_index, COLLECTION_NAME
+
+
+def make_vectors(rng: np.random.Generator, n: int, dimensions: int, n_clusters: int = 100) -> np.ndarray:
+    """
+    Returns n float32 vectors drawn around random cluster centres, like real text embeddings.
+    """
+    centres = rng.standard_normal((n_clusters, dimensions), dtype=np.float32)
+    labels = rng.integers(0, n_clusters, size=n)
+    return centres[labels] + 0.5 * rng.standard_normal((n, dimensions), dtype=np.float32)
+
+
+def build_indexes(path: str, vectors: np.ndarray) -> None:
+    """
+    Loads the vectors into a ChromaDB collection and exports it for the numpy backend.
+    """
+    chroma_client = chromadb.PersistentClient(path=path)
+    data_collection = chroma_client.create_collection(name=COLLECTION_NAME, metadata={"hnsw:space": "cosine"})
+    batch_size = chroma_client.get_max_batch_size()
+    for start in range(0, len(vectors), batch_size):
+        stop = min(start + batch_size, len(vectors))
+        ids = [str(i) for i in range(start, stop)]
+        data_collection.add(
+            ids=ids,
+            embeddings=vectors[start:stop],
+            documents=[f"Summary {i}" for i in ids],
+            metadatas=[{"idx": i} for i in ids],
+        )
+    bump_generation(COLLECTION_NAME, path)
+    export_numpy_index(data_collection, os.path.join(path, "numpy_index"))
+    chroma_client.clear_system_cache()
+
+
+def exact_neighbours(vectors: np.ndarray, queries: np.ndarray, k: int) -> list[set]:
+    """
+    Returns the IDs of the true k nearest neighbours (cosine) of every query.
+    """
+    matrix = vectors.astype(np.float64)
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+    neighbours = []
+    for start in range(0, len(queries), 64):
+        block = queries[start:start + 64].astype(np.float64)
+        scores = block @ matrix.T
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        neighbours.extend({str(i) for i in row} for row in top.tolist())
+    return neighbours
+
+
+def measure(backend, queries: np.ndarray, k: int, batch_size: int, truth: list[set]) -> dict:
+    """
+    Times single and batched queries against a backend and computes its recall@k.
+    """
+    backend.warm_up()
+    latencies, found = [], []
+    for query in queries:
+        started = time.perf_counter()
+        res = backend.query([query.tolist()], n_results=k)
+        latencies.append(time.perf_counter() - started)
+        found.append(set(res["ids"][0]))
+
+    batch_latencies = []
+    for start in range(0, len(queries), batch_size):
+        block = queries[start:start + batch_size].tolist()
+        started = time.perf_counter()
+        backend.query(block, n_results=k)
+        batch_latencies.append(time.perf_counter() - started)
+
+    p50, _, p99 = percentiles(latencies)
+    return {
+        "p50": p50,
+        "p99": p99,
+        "batch": statistics.median(batch_latencies),
+        "recall": statistics.mean(len(f & t) / k for f, t in zip(found, truth)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the chroma and numpy retrieval backends.")
+    parser.add_argument("--sizes", default="1000,100000,1000000", help="Comma separated collection sizes")
+    parser.add_argument("--dimensions", type=int, default=256, help="Embedding size")
+    parser.add_argument("--queries", type=int, default=200, help="Queries per size")
+    parser.add_argument("--k", type=int, default=10, help="Results per query")
+    parser.add_argument("--batch-size", type=int, default=32, help="Queries per batched call")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'size':>9} {'backend':<7} {'p50 ms':>8} {'p99 ms':>8} {f'batch{args.batch_size} ms':>10} {'recall@' + str(args.k):>10}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        vectors = make_vectors(rng, size, args.dimensions)
+        picks = rng.integers(0, size, size=args.queries)
+        queries = vectors[picks] + 0.3 * rng.standard_normal((args.queries, args.dimensions), dtype=np.float32)
+        queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+        truth = exact_neighbours(vectors, queries, args.k)
+
+        # Chroma data and the export take GBs for the large sizes; drop them before the next size
+        with tempfile.TemporaryDirectory(prefix="bb_backends_") as path:
+            build_indexes(path, vectors)
+            del vectors
+
+            backends = [("chroma", ChromaBackend(path)), ("numpy", NumpyBackend(os.path.join(path, "numpy_index")))]
+            for name, backend in backends:
+                stats = measure(backend, queries, args.k, args.batch_size, truth)
+                backend.close()
+                print(
+                    f"{size:>9} {name:<7} {stats['p50'] * 1000:>8.2f} {stats['p99'] * 1000:>8.2f} "
+                    f"{stats['batch'] * 1000:>10.2f} {stats['recall']:>10.3f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+Load benchmark for the /retrieve endpoint.
+
+Seeds a throwaway ChromaDB collection with random vectors, starts a local fake embedding
+server and fires concurrent requests at two versions of the endpoint, each served by its
+own single-worker uvicorn process:
+
+- before: the original endpoint, which calls the blocking retrieve() from an async handler
+- after: the current app, which uses retrieve_async()
+
+Throughput and latency percentiles are printed for both runs.
+
+Usage:
+    python bench_retrieve_load.py --requests 500 --concurrency 100 --latency-ms 50
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench import print_header, report, send_queries
+from fake_embedding_server import FakeEmbeddingServer
+
+
+def seed_collection(n_docs: int, dimensions: int) -> None:
+    """
+    Fills the benchmark collection with random unit-free vectors.
+    """
+    import chromadb
+    import retrieval_backends
+
+    chroma_client = chromadb.PersistentClient(path=retrieval_backends.VECTOR_DB_PATH)
+    data_collection = chroma_client.create_collection(
+        name=retrieval_backends.COLLECTION_NAME, metadata={"hnsw:space": "cosine"}
+    )
+    rng = random.Random(0)
+    batch_size = 1000
+    for start in range(0, n_docs, batch_size):
+        ids = [str(i) for i in range(start, min(start + batch_size, n_docs))]
+        data_collection.add(
+            ids=ids,
+            embeddings=[[rng.gauss(0.0, 1.0) for _ in range(dimensions)] for _ in ids],
+            documents=[f"Summary {i}" for i in ids],
+            metadatas=[{"idx": i} for i in ids],
+        )
+    retrieval_backends.bump_generation()
+
+
+def build_baseline_app():
+    """
+    Recreates the original endpoint: an async handler calling the blocking retrieve().
+    """
+    import openai
+    from fastapi import FastAPI
+
+    from app import QueryRequest
+    from query_vector_db import retrieve
+
+    baseline_app = FastAPI()
+    openai_client = openai.OpenAI()
+
+    @baseline_app.post("/retrieve")
+    async def retrieve_endpoint(request: QueryRequest):
+        contexts, metadata = retrieve(request.query, openai_client)
+        return {"contexts": contexts, "metadata": metadata}
+
+    return baseline_app
+
+
+def start_server(app_spec: str, factory: bool = False) -> tuple[subprocess.Popen, str]:
+    """
+    Runs the given ASGI app under uvicorn in a child process and waits until it accepts requests.
+    """
+    import httpx
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    command = [sys.executable, "-m", "uvicorn", app_spec, "--port", str(port), "--log-level", "warning"]
+    if factory:
+        command.append("--factory")
+    process = subprocess.Popen(command)
+
+    base_url = f"http://127.0.0.1:{port}"
+    for _ in range(300):
+        try:
+            httpx.get(base_url + "/docs")
+            return process, base_url
+        except httpx.TransportError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError(f"uvicorn did not start serving {app_spec}")
+
+
+async def run_load(base_url: str, n_requests: int, concurrency: int) -> tuple[list[float], float]:
+    """
+    Sends n_requests POST /retrieve calls with at most `concurrency` in flight.
+
+    Returns:
+        tuple: Latency of every request in seconds, wall-clock duration of the run
+    """
+    import httpx
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=None) as client:
+        return await send_queries(client, [f"book number {i}" for i in range(n_requests)], concurrency)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark /retrieve under concurrent load.")
+    parser.add_argument("--requests", type=int, default=500, help="Requests per run")
+    parser.add_argument("--concurrency", type=int, default=100, help="Requests in flight")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="Fake embedding latency")
+    parser.add_argument("--docs", type=int, default=1000, help="Documents in the collection")
+    parser.add_argument("--dimensions", type=int, default=1536, help="Embedding size")
+    parser.add_argument("--batch-size", type=int, default=64, help="Embedding micro-batch size")
+    parser.add_argument("--batch-wait-ms", type=float, default=5.0, help="Embedding micro-batch window")
+    args = parser.parse_args()
+
+    server = FakeEmbeddingServer(latency=args.latency_ms / 1000, dimensions=args.dimensions).start()
+
+    # Point every module at the fake server and a scratch database before they are imported
+    os.environ["OPENAI_BASE_URL"] = server.base_url
+    os.environ["OPENAI_API_KEY"] = "bench"
+    scratch = tempfile.TemporaryDirectory(prefix="bb_bench_")
+    os.environ["VECTOR_DB_PATH"] = scratch.name
+    os.environ["RETRIEVE_CONCURRENCY"] = str(args.concurrency)
+    os.environ["EMBEDDING_BATCH_SIZE"] = str(args.batch_size)
+    os.environ["EMBEDDING_BATCH_WAIT_MS"] = str(args.batch_wait_ms)
+    os.environ["EMBEDDING_CACHE_PATH"] = ""  # Keep the persistent cache out of the measurement
+
+    try:
+        seed_collection(args.docs, args.dimensions)
+
+        print(
+            f"{args.requests} requests, concurrency {args.concurrency}, "
+            f"embedding latency {args.latency_ms:.0f} ms, {args.docs} docs"
+        )
+        print_header("endpoint")
+        for label, app_spec, factory in [
+            ("before", "bench_retrieve_load:build_baseline_app", True),
+            ("after", "app:app", False),
+        ]:
+            process, base_url = start_server(app_spec, factory)
+            server.batch_sizes.clear()
+            try:
+                report(label, *asyncio.run(run_load(base_url, args.requests, args.concurrency)))
+            finally:
+                process.terminate()
+                process.wait()
+            print(
+                f"{'':<22} {len(server.batch_sizes)} embedding calls, "
+                f"{statistics.mean(server.batch_sizes):.1f} queries per call"
+            )
+    finally:
+        server.stop()
+        scratch.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Micro-batching of embedding requests.
+
+Concurrent callers each ask for the embedding of a single text; the batcher holds them for a
+few milliseconds (or until enough have queued up), sends them to OpenAI as one
+embeddings.create call and hands every caller its own vector back.
+"""
+
+import asyncio
+
+import openai
+
+
+class EmbeddingBatcher:
+    """
+    Coalesces concurrent single-text embedding requests into batched API calls.
+
+    Args:
+        openai_client (openai.AsyncOpenAI): Initialized async OpenAI client used for the batched calls
+        model (str): Embedding model name
+        max_batch_size (int): Flush as soon as this many texts are waiting
+        max_wait (float): Seconds the first text of a batch waits for others to join it
+
+    The batches and items attributes count API calls made and texts sent so far.
+    """
+
+    def __init__(
+        self,
+        openai_client: openai.AsyncOpenAI,
+        model: str,
+        max_batch_size: int = 64,
+        max_wait: float = 0.005,
+    ):
+        self.openai_client = openai_client
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.batches = 0
+        self.items = 0
+        self._pending = []  # (text, future) pairs waiting for the next flush
+        self._flush_handle = None
+        self._tasks = set()  # Strong references to in-flight batch calls
+
+    async def embed(self, text: str) -> list[float]:
+        """
+        Returns the embedding of a single text, sharing the API call with concurrent callers.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.ensure_future(self._send(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, batch: list) -> None:
+        # Identical texts in the same window are embedded once
+        texts = list(dict.fromkeys(text for text, _ in batch))
+        self.batches += 1
+        self.items += len(texts)
+        try:
+            try:
+                res = await self.openai_client.embeddings.create(input=texts, model=self.model)
+                embeddings = {texts[item.index]: item.embedding for item in res.data}
+            except openai.BadRequestError:
+                if len(texts) == 1:
+                    raise
+                # One invalid input rejects the whole call; retry one by one so only its caller fails
+                embeddings = await self._send_one_by_one(texts)
+            for text, future in batch:
+                # Callers that were cancelled while waiting have already given up on the result
+                if not future.done():
+                    if isinstance(embeddings[text], BaseException):
+                        future.set_exception(embeddings[text])
+                    else:
+                        future.set_result(embeddings[text])
+        except BaseException as e:
+            # Whatever went wrong (API error, incomplete response, cancellation), no caller may wait forever
+            for _, future in batch:
+                if not future.done():
+                    if isinstance(e, asyncio.CancelledError):
+                        future.cancel()
+                    else:
+                        future.set_exception(e)
+            if not isinstance(e, Exception):
+                raise
+
+    async def _send_one_by_one(self, texts: list[str]) -> dict:
+        """
+        Embeds every text in its own call, returning text -> embedding, or the exception of its call.
+        """
+        self.batches += len(texts)
+        results = await asyncio.gather(
+            *(self.openai_client.embeddings.create(input=[text], model=self.model) for text in texts),
+            return_exceptions=True,
+        )
+        return {
+            text: res if isinstance(res, BaseException) else res.data[0].embedding
+            for text, res in zip(texts, results)
+        }
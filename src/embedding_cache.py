@@ -0,0 +1,158 @@
+"""
+Two-level cache for query embeddings.
+
+Embeddings are keyed on the normalized query text and the embedding model name. The first
+level is an in-process LRU bounded in size; the second level is a SQLite table that survives
+restarts. Entries in both levels expire a fixed time-to-live after they were embedded.
+
+The in-memory level is cheap to consult from the event loop; the SQLite level does blocking
+I/O, so async callers look it up (get_disk) and write it (put_disk) from a worker thread.
+"""
+
+import sqlite3
+import threading
+import time
+from array import array
+from typing import Optional
+
+import cachetools
+
+
+def normalize_query(query: str) -> str:
+    """
+    Returns the cache key form of a query: case-folded with whitespace collapsed.
+    """
+    return " ".join(query.split()).casefold()
+
+
+class EmbeddingCache:
+    """
+    In-memory LRU in front of an on-disk SQLite store, both with TTL eviction.
+
+    Args:
+        path (str, optional): SQLite file for the persistent level, None keeps the cache in memory only
+        maxsize (int): Maximum number of embeddings held in memory
+        ttl (float): Seconds an embedding stays valid in either level
+
+    The hits_memory, hits_disk and misses attributes count lookups since creation.
+    """
+
+    def __init__(self, path: Optional[str], maxsize: int = 10_000, ttl: float = 7 * 24 * 3600):
+        self.ttl = ttl
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+        # The memory level and counters have their own lock, so event-loop callers never wait on disk I/O
+        self._memory_lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        # Values are (embedding, expiry time) so entries promoted from disk keep their original expiry
+        self._memory = cachetools.TLRUCache(maxsize=maxsize, ttu=lambda key, value, now: value[1], timer=time.time)
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            # In WAL mode NORMAL only fsyncs at checkpoints; losing the last writes on power loss only costs re-embedding
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                " model TEXT NOT NULL,"
+                " query TEXT NOT NULL,"
+                " vector BLOB NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " PRIMARY KEY (model, query))"
+            )
+            # Drop whatever expired while the process was not running
+            self._db.execute("DELETE FROM embeddings WHERE created_at < ?", (time.time() - ttl,))
+
+    @property
+    def persistent(self) -> bool:
+        """
+        Whether the cache has an on-disk level.
+        """
+        return self._db is not None
+
+    def get(self, query: str, model: str) -> Optional[list[float]]:
+        """
+        Looks up the embedding of a query in both levels, returning None on a miss.
+        """
+        embedding = self.get_memory(query, model)
+        if embedding is None:
+            embedding = self.get_disk(query, model)
+        return embedding
+
+    def get_memory(self, query: str, model: str) -> Optional[list[float]]:
+        """
+        Looks up the embedding of a query in the in-memory level only.
+
+        A miss is not counted, since the caller is expected to follow up with get_disk().
+        """
+        key = (model, normalize_query(query))
+        with self._memory_lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return None
+            self.hits_memory += 1
+            return entry[0]
+
+    def get_disk(self, query: str, model: str) -> Optional[list[float]]:
+        """
+        Looks up the embedding of a query in the SQLite level, promoting a hit to memory.
+
+        Does blocking I/O when the cache is persistent.
+        """
+        key = (model, normalize_query(query))
+        row = None
+        with self._db_lock:
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT vector, created_at FROM embeddings WHERE model = ? AND query = ?", key
+                ).fetchone()
+
+        with self._memory_lock:
+            if row is not None and row[1] >= time.time() - self.ttl:
+                embedding = array("f", row[0]).tolist()
+                self._memory[key] = (embedding, row[1] + self.ttl)
+                self.hits_disk += 1
+                return embedding
+
+            self.misses += 1
+            return None
+
+    def put(self, query: str, model: str, embedding: list[float]) -> None:
+        """
+        Stores the embedding of a query in both levels.
+        """
+        created_at = self.put_memory(query, model, embedding)
+        self.put_disk(query, model, embedding, created_at)
+
+    def put_memory(self, query: str, model: str, embedding: list[float]) -> float:
+        """
+        Stores the embedding of a query in the in-memory level, returning its creation time.
+        """
+        created_at = time.time()
+        with self._memory_lock:
+            self._memory[(model, normalize_query(query))] = (embedding, created_at + self.ttl)
+        return created_at
+
+    def put_disk(self, query: str, model: str, embedding: list[float], created_at: Optional[float] = None) -> None:
+        """
+        Stores the embedding of a query in the SQLite level, if any. Does blocking I/O.
+        """
+        with self._db_lock:
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO embeddings (model, query, vector, created_at) VALUES (?, ?, ?, ?)",
+                    (model, normalize_query(query), array("f", embedding).tobytes(), created_at or time.time()),
+                )
+
+    def stats(self) -> dict:
+        """
+        Returns the hit and miss counters.
+        """
+        return {"hits_memory": self.hits_memory, "hits_disk": self.hits_disk, "misses": self.misses}
+
+    def close(self) -> None:
+        with self._db_lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
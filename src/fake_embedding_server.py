@@ -0,0 +1,117 @@
+"""
+Local stand-in for the OpenAI embeddings API, used by the benchmarks.
+
+The server answers POST /v1/embeddings with deterministic pseudo-random vectors derived from
+the input text, after an artificial delay that mimics the network round trip to OpenAI.
+Point an OpenAI client at it with base_url=server.base_url and any API key.
+"""
+
+import argparse
+import base64
+import hashlib
+import json
+import random
+import threading
+import time
+from array import array
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_DIMENSIONS = 1536  # Same size as text-embedding-ada-002 vectors
+
+
+def fake_embedding(text: str, dimensions: int = DEFAULT_DIMENSIONS) -> list[float]:
+    """
+    Returns a deterministic pseudo-random embedding for the given text.
+    """
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    rng = random.Random(seed)
+    return [rng.gauss(0.0, 1.0) for _ in range(dimensions)]
+
+
+class FakeEmbeddingServer(ThreadingHTTPServer):
+    """
+    Threaded HTTP server emulating the OpenAI embeddings endpoint.
+
+    Args:
+        port (int): Port to listen on, 0 picks a free one
+        latency (float): Seconds to wait before answering each request
+        dimensions (int): Size of the returned embedding vectors
+    """
+
+    daemon_threads = True
+    request_queue_size = 1024  # Accept bursts of concurrent connections
+
+    def __init__(self, port: int = 0, latency: float = 0.05, dimensions: int = DEFAULT_DIMENSIONS):
+        super().__init__(("127.0.0.1", port), _EmbeddingHandler)
+        self.latency = latency
+        self.dimensions = dimensions
+        self.batch_sizes = []  # Number of inputs in every request served so far
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+    def start(self) -> "FakeEmbeddingServer":
+        """
+        Serves requests from a background thread.
+        """
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+class _EmbeddingHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep connections alive so clients can pool them
+    disable_nagle_algorithm = True  # Headers and body go out in separate writes
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/v1/embeddings":
+            self.send_error(404)
+            return
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        inputs = body["input"]
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        self.server.batch_sizes.append(len(inputs))
+        time.sleep(self.server.latency)
+
+        data = []
+        for i, text in enumerate(inputs):
+            embedding = fake_embedding(text, self.server.dimensions)
+            if body.get("encoding_format") == "base64":
+                embedding = base64.b64encode(array("f", embedding).tobytes()).decode("ascii")
+            data.append({"object": "embedding", "index": i, "embedding": embedding})
+        payload = json.dumps(
+            {
+                "object": "list",
+                "data": data,
+                "model": body["model"],
+                "usage": {"prompt_tokens": 0, "total_tokens": 0},
+            }
+        ).encode("utf-8")
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass  # Keep benchmark output readable
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a fake OpenAI embeddings server.")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--dimensions", type=int, default=DEFAULT_DIMENSIONS)
+    args = parser.parse_args()
+
+    server = FakeEmbeddingServer(args.port, args.latency_ms / 1000, args.dimensions)
+    print(f"Serving fake embeddings on {server.base_url}")
+    server.serve_forever()
@@ -0,0 +1,183 @@
+"""
+Latency instrumentation of the retrieval path.
+
+Each stage of a request (waiting for a concurrency slot, embedding the query, opening the
+vector index, querying it, serializing the response, ...) is timed with stage_timer() and
+recorded in a fixed-bucket histogram. render_prometheus() formats every histogram in the
+Prometheus text exposition format for the /metrics endpoint.
+
+When TRACING_ENABLED is set and OpenTelemetry is installed, every timed stage is also
+recorded as a span, nested under the request span created by the FastAPI instrumentation.
+Spans are exported over OTLP/gRPC by the OpenTelemetry SDK, configured through the standard
+OTEL_EXPORTER_OTLP_* and OTEL_SERVICE_NAME variables.
+"""
+
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Optional
+
+try:
+    from opentelemetry import trace
+except ImportError:  # OpenTelemetry is optional
+    trace = None
+
+# Emit an OpenTelemetry span for every timed stage
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "").lower() in ("1", "true", "yes") and trace is not None
+# Histogram bucket upper bounds in seconds
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+
+def _init_tracing() -> None:
+    """
+    Installs an SDK tracer provider exporting spans over OTLP, unless one is already set
+    (e.g. when the app runs under opentelemetry-instrument).
+    """
+    from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor
+
+    if not isinstance(trace.get_tracer_provider(), trace.ProxyTracerProvider):
+        return
+    provider = TracerProvider(
+        resource=Resource.create({"service.name": os.getenv("OTEL_SERVICE_NAME", "book-buddy-retrieval")})
+    )
+    provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))  # Flushed at interpreter exit
+    trace.set_tracer_provider(provider)
+
+
+if TRACING_ENABLED:
+    _init_tracing()
+_tracer = trace.get_tracer(__name__) if TRACING_ENABLED else None
+
+
+class Histogram:
+    """
+    Cumulative latency histogram with fixed buckets.
+
+    Args:
+        buckets (tuple[float, ...]): Sorted bucket upper bounds in seconds
+
+    When samples is a list, every observed value is also appended to it, which lets the
+    benchmark compute exact percentiles.
+    """
+
+    def __init__(self, buckets: tuple = BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # The last bucket is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self.samples = None
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+            if self.samples is not None:
+                self.samples.append(value)
+
+
+# Stage name -> histogram, guarded by _histograms_lock when adding stages
+_histograms = {}
+_histograms_lock = threading.Lock()
+_keep_samples = False  # Whether new histograms keep every observed value
+
+
+def get_histogram(stage: str) -> Histogram:
+    """
+    Returns the histogram of a stage, creating it on first use.
+    """
+    histogram = _histograms.get(stage)
+    if histogram is None:
+        with _histograms_lock:
+            histogram = _histograms.get(stage)
+            if histogram is None:
+                histogram = _histograms[stage] = Histogram()
+                if _keep_samples:
+                    histogram.samples = []
+    return histogram
+
+
+class stage_timer:
+    """
+    Context manager timing one stage of the retrieval path.
+
+    Usage:
+        with stage_timer("vector_query"):
+            ...
+    """
+
+    __slots__ = ("stage", "started", "span")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+        self.span = None
+
+    def __enter__(self):
+        if _tracer is not None:
+            self.span = _tracer.start_as_current_span(f"retrieve.{self.stage}")
+            self.span.__enter__()
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        get_histogram(self.stage).observe(time.perf_counter() - self.started)
+        if self.span is not None:
+            self.span.__exit__(exc_type, exc, tb)
+        return False
+
+
+def record_samples(enabled: bool = True) -> None:
+    """
+    Starts (or stops) keeping every observed value, for exact percentiles in the benchmark.
+    """
+    global _keep_samples
+    with _histograms_lock:
+        _keep_samples = enabled
+        for histogram in _histograms.values():
+            with histogram._lock:
+                histogram.samples = [] if enabled else None
+
+
+def samples() -> dict[str, list[float]]:
+    """
+    Returns the values recorded since record_samples() was enabled, per stage.
+    """
+    with _histograms_lock:
+        return {stage: list(h.samples or []) for stage, h in _histograms.items()}
+
+
+def render_prometheus(counters: Optional[dict] = None) -> str:
+    """
+    Formats the stage histograms, plus optional counters, in the Prometheus text format.
+
+    Args:
+        counters (dict, optional): Metric name -> (help text, list of (labels dict, value) pairs)
+    """
+    lines = [
+        "# HELP retrieval_stage_seconds Time spent in each stage of the retrieval path.",
+        "# TYPE retrieval_stage_seconds histogram",
+    ]
+    for stage, histogram in sorted(_histograms.items()):
+        with histogram._lock:
+            counts, total, count = list(histogram.counts), histogram.sum, histogram.count
+        cumulative = 0
+        for bound, n in zip(list(histogram.buckets) + ["+Inf"], counts):
+            cumulative += n
+            lines.append(f'retrieval_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+        lines.append(f'retrieval_stage_seconds_sum{{stage="{stage}"}} {total}')
+        lines.append(f'retrieval_stage_seconds_count{{stage="{stage}"}} {count}')
+
+    for name, (help_text, values) in (counters or {}).items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} counter")
+        for labels, value in values:
+            label_text = ",".join(f'{key}="{label}"' for key, label in labels.items())
+            lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+    return "\n".join(lines) + "\n"
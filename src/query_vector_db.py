@@ -4,15 +4,278 @@ Module for retrieving book summaries from a vector database using semantic simil
 This module provides functionality to search through book summaries stored in a ChromaDB
 vector database by converting search queries into embeddings and finding the most 
 semantically similar documents.
+
+The nearest-neighbour search itself is delegated to a process-wide RetrievalBackend chosen
+with RETRIEVAL_BACKEND: "chroma" (default) queries the ChromaDB collection, "numpy" runs an
+exact search over an in-memory export of it (see retrieval_backends.py).
+
+retrieve_async() is the non-blocking variant used by the API: it awaits the embedding call
+on an async OpenAI client and runs the vector query on a bounded thread pool.
+
+Query embeddings are looked up in a shared two-level EmbeddingCache before calling OpenAI.
+On a miss the async path can hand the query to an EmbeddingBatcher, which coalesces it with
+concurrent misses into a single batched API call.
+
+retrieve_batch_async() answers many queries at once: it embeds all cache misses with one
+API call and runs one multi-embedding vector query per distinct metadata filter, returning
+the top k documents of each query with their distances.
+
+Single-result lookups go through a SemanticCache first: when a recent query's embedding is
+within SEMANTIC_CACHE_THRESHOLD cosine similarity of the new one, its result is reused
+without querying the backend. The cache is emptied whenever the backend's data changes.
+
+Every stage (embedding cache lookup, embedding call, semantic cache lookup, vector query)
+is timed with metrics.stage_timer() for the /metrics endpoint.
 """
 
-import chromadb
+import asyncio
+import contextvars
+import functools
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
 import openai
 
-# Name of the ChromaDB collection containing the book summaries
-# This should match the collection name used when populating the database
-COLLECTION_NAME = "bb_summaries"
-VECTOR_DB_PATH = "../vector_db"
+from embedding_batcher import EmbeddingBatcher
+from embedding_cache import EmbeddingCache, normalize_query
+from metrics import stage_timer
+from retrieval_backends import RetrievalBackend, create_backend
+from semantic_cache import SemanticCache
+
+EMBEDDING_MODEL = "text-embedding-ada-002"
+# Nearest-neighbour search backend: "chroma" or "numpy"
+RETRIEVAL_BACKEND = os.getenv("RETRIEVAL_BACKEND", "chroma")
+# Maximum number of vector queries running at the same time on behalf of retrieve_async()
+CHROMA_QUERY_WORKERS = int(os.getenv("CHROMA_QUERY_WORKERS", "8"))
+# Query embedding cache: SQLite file (empty to keep it in memory only), LRU size and TTL in seconds
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "../embedding_cache.sqlite3")
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "10000"))
+EMBEDDING_CACHE_TTL = float(os.getenv("EMBEDDING_CACHE_TTL", str(7 * 24 * 3600)))
+# Semantic result cache: number of recent queries kept (0 disables it) and the minimum
+# cosine similarity for a new query to reuse a cached result
+SEMANTIC_CACHE_SIZE = int(os.getenv("SEMANTIC_CACHE_SIZE", "1024"))
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+# Process-wide state, guarded by _state_lock
+_state_lock = threading.Lock()
+_backend = None
+_query_executor = None
+_embedding_cache = None
+_semantic_cache = None
+
+
+def get_backend() -> RetrievalBackend:
+    """
+    Returns the process-wide retrieval backend, creating it on first use.
+    """
+    global _backend
+    with _state_lock:
+        if _backend is None:
+            _backend = create_backend(RETRIEVAL_BACKEND)
+        return _backend
+
+
+def _get_query_executor() -> ThreadPoolExecutor:
+    global _query_executor
+    with _state_lock:
+        if _query_executor is None:
+            _query_executor = ThreadPoolExecutor(
+                max_workers=CHROMA_QUERY_WORKERS, thread_name_prefix="vector-query"
+            )
+        return _query_executor
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    """
+    Returns the process-wide query embedding cache, opening it on first use.
+    """
+    global _embedding_cache
+    with _state_lock:
+        if _embedding_cache is None:
+            _embedding_cache = EmbeddingCache(
+                EMBEDDING_CACHE_PATH, maxsize=EMBEDDING_CACHE_SIZE, ttl=EMBEDDING_CACHE_TTL
+            )
+        return _embedding_cache
+
+
+def get_semantic_cache() -> Optional[SemanticCache]:
+    """
+    Returns the process-wide semantic result cache, or None when it is disabled.
+    """
+    global _semantic_cache
+    with _state_lock:
+        if _semantic_cache is None and SEMANTIC_CACHE_SIZE > 0:
+            _semantic_cache = SemanticCache(SEMANTIC_CACHE_SIZE, SEMANTIC_CACHE_THRESHOLD)
+        return _semantic_cache
+
+
+def close_client() -> None:
+    """
+    Releases the shared retrieval backend, query thread pool and caches.
+    """
+    global _backend, _query_executor, _embedding_cache, _semantic_cache
+    with _state_lock:
+        if _backend is not None:
+            _backend.close()
+            _backend = None
+        if _query_executor is not None:
+            _query_executor.shutdown(wait=False)
+            _query_executor = None
+        if _embedding_cache is not None:
+            _embedding_cache.close()
+            _embedding_cache = None
+        _semantic_cache = None
+
+
+def warm_up() -> None:
+    """
+    Opens the embedding cache (its SQLite file and expiry sweep), then the retrieval backend,
+    and loads the vector index into memory before the first real request arrives.
+    """
+    get_embedding_cache()
+    get_backend().warm_up()
+
+
+def embed_query(query: str, openai_client: openai.OpenAI) -> list[float]:
+    """
+    Returns the embedding of a query, calling OpenAI only on a cache miss.
+    """
+    cache = get_embedding_cache()
+    with stage_timer("embedding_cache"):
+        emb = cache.get(query, EMBEDDING_MODEL)
+    if emb is None:
+        with stage_timer("embedding"):
+            emb = openai_client.embeddings.create(input=[query], model=EMBEDDING_MODEL)
+        emb = emb.data[0].embedding
+        cache.put(query, EMBEDDING_MODEL, emb)
+    return emb
+
+
+async def _cache_get_async(cache: EmbeddingCache, queries: list[str]) -> list[Optional[list[float]]]:
+    """
+    Looks up several queries in the embedding cache, reading its SQLite level off the event loop.
+    """
+    embeddings = [cache.get_memory(query, EMBEDDING_MODEL) for query in queries]
+    misses = [i for i, emb in enumerate(embeddings) if emb is None]
+    if misses:
+        if cache.persistent:
+            found = await _run_in_executor(lambda: [cache.get_disk(queries[i], EMBEDDING_MODEL) for i in misses])
+        else:
+            found = [cache.get_disk(queries[i], EMBEDDING_MODEL) for i in misses]  # Only counts the misses
+        for i, emb in zip(misses, found):
+            embeddings[i] = emb
+    return embeddings
+
+
+async def _cache_put_async(cache: EmbeddingCache, embedded: dict) -> None:
+    """
+    Stores query -> embedding pairs in the embedding cache, writing its SQLite level off the event loop.
+    """
+    created = {query: cache.put_memory(query, EMBEDDING_MODEL, emb) for query, emb in embedded.items()}
+    if cache.persistent:
+        await _run_in_executor(
+            lambda: [cache.put_disk(query, EMBEDDING_MODEL, emb, created[query]) for query, emb in embedded.items()]
+        )
+
+
+async def embed_query_async(
+    query: str,
+    openai_client: openai.AsyncOpenAI,
+    embedding_batcher: Optional[EmbeddingBatcher] = None,
+) -> list[float]:
+    """
+    Async counterpart of embed_query(); cache misses go through embedding_batcher when given.
+    """
+    cache = get_embedding_cache()
+    with stage_timer("embedding_cache"):
+        emb = (await _cache_get_async(cache, [query]))[0]
+    if emb is None:
+        with stage_timer("embedding"):
+            if embedding_batcher is not None:
+                emb = await embedding_batcher.embed(query)
+            else:
+                emb = await openai_client.embeddings.create(input=[query], model=EMBEDDING_MODEL)
+                emb = emb.data[0].embedding
+        await _cache_put_async(cache, {query: emb})
+    return emb
+
+
+async def embed_queries_async(queries: list[str], openai_client: openai.AsyncOpenAI) -> list[list[float]]:
+    """
+    Returns the embeddings of several queries, embedding all cache misses in one API call.
+    """
+    cache = get_embedding_cache()
+    with stage_timer("embedding_cache"):
+        embeddings = await _cache_get_async(cache, queries)
+    # Queries sharing a cache key (e.g. "Dune" and "dune ") are embedded once, as their first spelling
+    misses = {}
+    for query, emb in zip(queries, embeddings):
+        if emb is None:
+            misses.setdefault(normalize_query(query), query)
+    if misses:
+        keys = list(misses)
+        with stage_timer("embedding"):
+            res = await openai_client.embeddings.create(input=list(misses.values()), model=EMBEDDING_MODEL)
+        embedded = {keys[item.index]: item.embedding for item in res.data}
+        await _cache_put_async(cache, {misses[key]: emb for key, emb in embedded.items()})
+        embeddings = [
+            embedded[normalize_query(query)] if emb is None else emb for query, emb in zip(queries, embeddings)
+        ]
+    return embeddings
+
+
+def _query_collection(emb: list[float]) -> dict:
+    """
+    Finds the document closest to the given embedding.
+    """
+    # Uses cosine similarity between the query embedding and document embeddings
+    with stage_timer("vector_query"):
+        return get_backend().query(
+            [emb],
+            n_results=1,  # Only retrieve the single most relevant result
+        )
+
+
+def _retrieve_by_embedding(emb: list[float]) -> tuple[list, list]:
+    """
+    Returns the contexts and metadata of the document closest to the given embedding,
+    reusing the result of a recent near-duplicate query when the semantic cache has one.
+    """
+    # Read the version before querying so a result is never tagged newer than its data
+    version = get_backend().version()
+    semantic_cache = get_semantic_cache()
+    if semantic_cache is not None:
+        with stage_timer("semantic_cache"):
+            cached = semantic_cache.lookup(emb, version)
+        if cached is not None:
+            return cached
+
+    res = _query_collection(emb)
+    result = (res["documents"], res["metadatas"])
+    if semantic_cache is not None:
+        semantic_cache.put(emb, result, version)
+    return result
+
+
+def _query_collection_batch(embeddings: list[list[float]], n_results: int, where: Optional[dict]) -> dict:
+    """
+    Finds the n_results closest documents to each embedding, restricted to documents matching where.
+    """
+    with stage_timer("vector_query"):
+        return get_backend().query(embeddings, n_results=n_results, where=where)
+
+
+def _run_in_executor(func, *args) -> asyncio.Future:
+    """
+    Runs func on the bounded query thread pool, keeping the caller's context (e.g. the
+    current tracing span) so work done in the thread is attributed to the right request.
+    """
+    context = contextvars.copy_context()
+    return asyncio.get_running_loop().run_in_executor(
+        _get_query_executor(), functools.partial(context.run, func, *args)
+    )
 
 
 def retrieve(query: str, openai_client: openai.OpenAI) -> tuple[list, list]:
@@ -33,26 +296,89 @@ def retrieve(query: str, openai_client: openai.OpenAI) -> tuple[list, list]:
     2. Using ChromaDB to find the most similar document based on cosine similarity
     3. Returning both the matched document text and its metadata
     """
-    # Generate embedding vector for the search query using OpenAI's API
+    # Generate embedding vector for the search query using OpenAI's API (or the cache)
     # The embedding is a high-dimensional vector representing the semantic meaning
-    emb = openai_client.embeddings.create(input=[query], model="text-embedding-ada-002")
-    emb = emb.data[0].embedding  # Extract the actual embedding vector
+    emb = embed_query(query, openai_client)
 
-    # Initialize ChromaDB client with path to persistent storage
-    chroma_client = chromadb.PersistentClient(path=VECTOR_DB_PATH)
+    # Query the collection (or the semantic cache) to find the most similar document
+    # Returns the matched book summaries and their associated metadata
+    contexts, metadata = _retrieve_by_embedding(emb)
 
-    # Get the collection containing our book summaries and their embeddings
-    data_collection = chroma_client.get_collection(name=COLLECTION_NAME)
+    return contexts, metadata
 
-    # Query the collection to find the most similar document
-    # Uses cosine similarity between the query embedding and document embeddings
-    res = data_collection.query(
-        query_embeddings=[emb],
-        n_results=1,  # Only retrieve the single most relevant result
-    )
 
-    # Extract and return the results
-    contexts = res["documents"]  # The matched book summaries
-    metadata = res["metadatas"]  # Associated metadata for the matches
+async def retrieve_async(
+    query: str,
+    openai_client: openai.AsyncOpenAI,
+    embedding_batcher: Optional[EmbeddingBatcher] = None,
+) -> tuple[list, list]:
+    """
+    Async counterpart of retrieve() that never blocks the event loop.
 
-    return contexts, metadata
+    Args:
+        query (str): The search query text to find matching book summaries for
+        openai_client (openai.AsyncOpenAI): Initialized async OpenAI client for generating embeddings
+        embedding_batcher (EmbeddingBatcher, optional): Coalesces the embedding call with
+            concurrent requests instead of calling openai_client directly
+
+    Returns:
+        tuple[list, list]: The same (contexts, metadata) pair as retrieve()
+    """
+    emb = await embed_query_async(query, openai_client, embedding_batcher)
+
+    # The vector query is synchronous, so it runs on the bounded thread pool
+    return await _run_in_executor(_retrieve_by_embedding, emb)
+
+
+async def retrieve_batch_async(queries: list[dict], openai_client: openai.AsyncOpenAI) -> list[dict]:
+    """
+    Retrieves ranked book summaries for many queries at once.
+
+    Args:
+        queries (list[dict]): One dict per query with keys:
+            - query (str): The search query text
+            - k (int): Maximum number of summaries to return
+            - min_similarity (float, optional): Drop results whose cosine similarity is lower
+            - where (dict, optional): ChromaDB metadata filter the results must match
+        openai_client (openai.AsyncOpenAI): Initialized async OpenAI client for generating embeddings
+
+    Returns:
+        list[dict]: For each query, in order, the ids, contexts, metadata and distances of its
+        results, closest first
+    """
+    embeddings = await embed_queries_async([q["query"] for q in queries], openai_client)
+
+    # Queries sharing a metadata filter are answered by a single multi-embedding query
+    groups = {}
+    for i, q in enumerate(queries):
+        where = q.get("where") or None
+        groups.setdefault(json.dumps(where, sort_keys=True), (where, []))[1].append(i)
+
+    group_results = await asyncio.gather(
+        *(
+            _run_in_executor(
+                _query_collection_batch,
+                [embeddings[i] for i in indices],
+                max(queries[i]["k"] for i in indices),
+                where,
+            )
+            for where, indices in groups.values()
+        )
+    )
+
+    results = [None] * len(queries)
+    for (_, indices), res in zip(groups.values(), group_results):
+        for row, i in enumerate(indices):
+            k = queries[i]["k"]
+            min_similarity = queries[i].get("min_similarity")
+            # Cosine distance is 1 - cosine similarity
+            max_distance = None if min_similarity is None else 1 - min_similarity
+            hits = zip(res["ids"][row], res["documents"][row], res["metadatas"][row], res["distances"][row])
+            hits = [hit for hit in list(hits)[:k] if max_distance is None or hit[3] <= max_distance]
+            results[i] = {
+                "ids": [hit[0] for hit in hits],
+                "contexts": [hit[1] for hit in hits],
+                "metadata": [hit[2] for hit in hits],
+                "distances": [hit[3] for hit in hits],
+            }
+    return results
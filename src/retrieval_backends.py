@@ -0,0 +1,431 @@
+"""
+Nearest-neighbour search backends over the book summary embeddings.
+
+query_vector_db talks to a RetrievalBackend, selected with the RETRIEVAL_BACKEND setting:
+
+- ChromaBackend (chroma) queries the active ChromaDB collection through its HNSW index.
+  A single client and collection handle are shared by every query in the process and are
+  reopened when populate_vector_db.py rewrites the generation marker next to the database.
+  The marker also names the active collection, so a full rebuild can be built under another
+  name and swapped in by rewriting the marker.
+- NumpyBackend (numpy) holds every embedding in one contiguous, pre-normalized float32
+  matrix memory-mapped from an index exported from the collection, and answers queries
+  exactly with a single matrix product and a partial sort.
+
+Both return results shaped like chromadb's Collection.query(): lists of ids, documents,
+metadatas and cosine distances, one inner list per query embedding.
+"""
+
+import json
+import operator
+import os
+import threading
+import uuid
+from abc import ABC, abstractmethod
+from typing import Optional
+
+import chromadb
+import numpy as np
+from chromadb.api.types import validate_where as _validate_chroma_where
+from chromadb.errors import InvalidCollectionException
+
+from metrics import stage_timer
+
+# Name of the ChromaDB collection containing the book summaries
+# This should match the collection name used when populating the database
+COLLECTION_NAME = "bb_summaries"
+VECTOR_DB_PATH = os.getenv("VECTOR_DB_PATH", "../vector_db")
+# Exported copy of the collection read by NumpyBackend
+NUMPY_INDEX_PATH = os.getenv("NUMPY_INDEX_PATH", os.path.join(VECTOR_DB_PATH, "numpy_index"))
+# Name of the marker file rewritten by populate_vector_db.py after every change to the
+# collection; it holds the name of the active collection, which defaults to COLLECTION_NAME
+GENERATION_FILE_NAME = ".generation"
+
+
+def _read_fingerprint(path: str):
+    """
+    Returns a cheap fingerprint of a file that changes whenever it is replaced, or None if missing.
+    """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_ino, stat.st_mtime_ns)
+
+
+def _write_atomic(path: str, payload: dict) -> None:
+    # Readers never see a partially written file
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(payload, f)
+    os.replace(tmp_path, path)
+
+
+def active_collection_name(path: str = VECTOR_DB_PATH) -> str:
+    """
+    Returns the name of the collection readers should query.
+    """
+    try:
+        with open(os.path.join(path, GENERATION_FILE_NAME)) as f:
+            return json.load(f)["collection"]
+    except (FileNotFoundError, ValueError, KeyError, TypeError):
+        return COLLECTION_NAME
+
+
+def bump_generation(collection_name: Optional[str] = None, path: str = VECTOR_DB_PATH) -> None:
+    """
+    Signals running readers that the collection changed and must be reopened.
+
+    Args:
+        collection_name (str, optional): Make this the active collection; keeps the current one if omitted
+        path (str): ChromaDB persistent store the marker belongs to
+
+    The marker is replaced atomically, so readers switch from the old collection to the new
+    one in a single step.
+    """
+    if collection_name is None:
+        collection_name = active_collection_name(path)
+    os.makedirs(path, exist_ok=True)
+    _write_atomic(os.path.join(path, GENERATION_FILE_NAME), {"collection": collection_name, "pid": os.getpid()})
+
+
+class RetrievalBackend(ABC):
+    """
+    Interface of a nearest-neighbour search backend.
+    """
+
+    @abstractmethod
+    def query(self, embeddings: list[list[float]], n_results: int, where: Optional[dict] = None) -> dict:
+        """
+        Finds the n_results closest documents to each embedding.
+
+        Args:
+            embeddings (list[list[float]]): Query embeddings
+            n_results (int): Number of results per query
+            where (dict, optional): ChromaDB metadata filter the results must match
+
+        Returns:
+            dict: "ids", "documents", "metadatas" and "distances" lists, one inner list per
+            query embedding, closest first
+        """
+
+    @abstractmethod
+    def version(self):
+        """
+        Returns a token that changes whenever the data behind the backend is replaced or updated.
+        """
+
+    def warm_up(self) -> None:
+        """
+        Loads the index so the first real query does not pay for it.
+        """
+
+    def close(self) -> None:
+        """
+        Releases the resources held by the backend.
+        """
+
+
+class ChromaBackend(RetrievalBackend):
+    """
+    Searches the active ChromaDB collection.
+
+    Args:
+        path (str): ChromaDB persistent store
+    """
+
+    def __init__(self, path: str = VECTOR_DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._client = None
+        self._collection = None
+        self._generation = None
+
+    def _close_locked(self) -> None:
+        if self._client is not None:
+            # Stops the cached ChromaDB system so the next client reloads state from disk
+            self._client.clear_system_cache()
+        self._client = None
+        self._collection = None
+        self._generation = None
+
+    def get_collection(self, refresh: bool = False) -> chromadb.Collection:
+        """
+        Returns the shared handle to the active collection, opening it on first use.
+
+        Args:
+            refresh (bool): Force the client and collection to be reopened
+        """
+        generation = _read_fingerprint(os.path.join(self.path, GENERATION_FILE_NAME))
+        if not refresh and self._collection is not None and generation == self._generation:
+            return self._collection
+
+        with self._lock:
+            # Another thread may have reopened the collection while we waited for the lock
+            if not refresh and self._collection is not None and generation == self._generation:
+                return self._collection
+            with stage_timer("client_setup"):
+                self._close_locked()
+                self._client = chromadb.PersistentClient(path=self.path)
+                self._collection = self._client.get_collection(name=active_collection_name(self.path))
+            self._generation = generation
+            return self._collection
+
+    def query(self, embeddings: list[list[float]], n_results: int, where: Optional[dict] = None) -> dict:
+        if where:
+            validate_where(where)
+        # Uses cosine similarity between the query embeddings and document embeddings
+        try:
+            return self.get_collection().query(query_embeddings=embeddings, n_results=n_results, where=where)
+        except InvalidCollectionException:
+            # The collection was dropped under us (e.g. mid-rebuild); reopen and try once more
+            return self.get_collection(refresh=True).query(
+                query_embeddings=embeddings, n_results=n_results, where=where
+            )
+
+    def version(self):
+        return _read_fingerprint(os.path.join(self.path, GENERATION_FILE_NAME))
+
+    def warm_up(self) -> None:
+        data_collection = self.get_collection()
+        sample = data_collection.get(limit=1, include=["embeddings"])
+        if sample["embeddings"] is not None and len(sample["embeddings"]) > 0:
+            data_collection.query(query_embeddings=[sample["embeddings"][0]], n_results=1)
+
+    def close(self) -> None:
+        with self._lock:
+            self._close_locked()
+
+
+def export_numpy_index(data_collection: chromadb.Collection, path: str = NUMPY_INDEX_PATH, page_size: int = 10_000) -> int:
+    """
+    Writes the collection's embeddings, documents and metadata in the format read by NumpyBackend.
+
+    Embeddings are normalized to unit length and stored as a raw row-major float32 matrix.
+    The manifest naming the current files is replaced last, so running NumpyBackend
+    instances switch to the new export atomically.
+
+    Returns:
+        int: Number of exported documents
+    """
+    os.makedirs(path, exist_ok=True)
+    token = uuid.uuid4().hex
+    matrix_file = f"embeddings-{token}.f32"
+    records_file = f"records-{token}.json"
+
+    ids, documents, metadatas = [], [], []
+    dimensions = None
+    with open(os.path.join(path, matrix_file), "wb") as f:
+        offset = 0
+        while True:
+            page = data_collection.get(
+                include=["embeddings", "documents", "metadatas"], limit=page_size, offset=offset
+            )
+            if len(page["ids"]) > 0:
+                vectors = np.asarray(page["embeddings"], dtype=np.float32)
+                vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+                dimensions = vectors.shape[1]
+                f.write(vectors.tobytes())
+                ids.extend(page["ids"])
+                documents.extend(page["documents"])
+                metadatas.extend(page["metadatas"])
+            if len(page["ids"]) < page_size:
+                break
+            offset += page_size
+
+    with open(os.path.join(path, records_file), "w", encoding="utf-8") as f:
+        json.dump({"ids": ids, "documents": documents, "metadatas": metadatas}, f)
+
+    manifest_path = os.path.join(path, "manifest.json")
+    _write_atomic(
+        manifest_path,
+        {"count": len(ids), "dimensions": dimensions or 0, "embeddings": matrix_file, "records": records_file},
+    )
+
+    # Drop files of previous exports; instances still mapping them keep their open copy
+    for name in os.listdir(path):
+        if name.startswith(("embeddings-", "records-")) and token not in name:
+            os.remove(os.path.join(path, name))
+    return len(ids)
+
+
+# Operators that order values; ChromaDB only applies them to numbers
+_ORDERING_OPERATORS = ("$gt", "$gte", "$lt", "$lte")
+
+
+def validate_where(where: dict) -> None:
+    """
+    Raises ValueError unless where is a metadata filter both backends evaluate.
+
+    Runs ChromaDB's own checks, and also rejects booleans as operands of the ordering
+    operators, which ChromaDB accepts but then fails to evaluate.
+    """
+    _validate_chroma_where(where)
+    for key, condition in where.items():
+        if key in ("$and", "$or"):
+            for clause in condition:
+                validate_where(clause)
+        elif isinstance(condition, dict):
+            for op, operand in condition.items():
+                if op in _ORDERING_OPERATORS and isinstance(operand, bool):
+                    raise ValueError(f"Expected operand value to be an int or a float for operator {op}, got {operand}")
+
+
+def _kind(value) -> type:
+    # ChromaDB keeps booleans, numbers and strings apart; ints and floats compare as numbers
+    if isinstance(value, bool):
+        return bool
+    if isinstance(value, (int, float)):
+        return float
+    return type(value)
+
+
+def _equals(value, operand) -> bool:
+    return _kind(value) is _kind(operand) and value == operand
+
+
+def _ordered(compare):
+    # Missing keys, strings and booleans never satisfy an ordering operator
+    return lambda value, operand: _kind(value) is float and compare(value, operand)
+
+
+# ChromaDB where-filter comparison operators; missing keys only match $ne and $nin
+_OPERATORS = {
+    "$eq": _equals,
+    "$ne": lambda value, operand: not _equals(value, operand),
+    "$gt": _ordered(operator.gt),
+    "$gte": _ordered(operator.ge),
+    "$lt": _ordered(operator.lt),
+    "$lte": _ordered(operator.le),
+    "$in": lambda value, operand: any(_equals(value, item) for item in operand),
+    "$nin": lambda value, operand: not any(_equals(value, item) for item in operand),
+}
+
+
+def _matches(metadata: Optional[dict], where: dict) -> bool:
+    """
+    Evaluates a ChromaDB metadata filter, already checked by validate_where(), against one
+    document's metadata.
+    """
+    metadata = metadata or {}
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(_matches(metadata, clause) for clause in condition):
+                return False
+        elif key == "$or":
+            if not any(_matches(metadata, clause) for clause in condition):
+                return False
+        else:
+            if not isinstance(condition, dict):
+                condition = {"$eq": condition}
+            value = metadata.get(key)
+            for op, operand in condition.items():
+                if not _OPERATORS[op](value, operand):
+                    return False
+    return True
+
+
+class NumpyBackend(RetrievalBackend):
+    """
+    Exact cosine search over an in-memory matrix of pre-normalized embeddings.
+
+    Args:
+        path (str): Directory written by export_numpy_index()
+    """
+
+    def __init__(self, path: str = NUMPY_INDEX_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._index = None  # (matrix, ids, documents, metadatas)
+        self._fingerprint = None
+
+    def _get_index(self) -> tuple:
+        manifest_path = os.path.join(self.path, "manifest.json")
+        fingerprint = _read_fingerprint(manifest_path)
+        if self._index is not None and fingerprint == self._fingerprint:
+            return self._index
+
+        with self._lock:
+            if self._index is not None and fingerprint == self._fingerprint:
+                return self._index
+            with stage_timer("client_setup"):
+                with open(manifest_path, encoding="utf-8") as f:
+                    manifest = json.load(f)
+                with open(os.path.join(self.path, manifest["records"]), encoding="utf-8") as f:
+                    records = json.load(f)
+                if manifest["count"] > 0:
+                    matrix = np.memmap(
+                        os.path.join(self.path, manifest["embeddings"]),
+                        dtype=np.float32,
+                        mode="r",
+                        shape=(manifest["count"], manifest["dimensions"]),
+                    )
+                else:
+                    matrix = np.empty((0, 0), dtype=np.float32)
+            self._index = (matrix, records["ids"], records["documents"], records["metadatas"])
+            self._fingerprint = fingerprint
+            return self._index
+
+    def query(self, embeddings: list[list[float]], n_results: int, where: Optional[dict] = None) -> dict:
+        matrix, ids, documents, metadatas = self._get_index()
+
+        rows = None
+        if where:
+            validate_where(where)
+            rows = np.fromiter(
+                (i for i, metadata in enumerate(metadatas) if _matches(metadata, where)), dtype=np.int64
+            )
+            matrix = matrix[rows]
+
+        result = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        k = min(n_results, matrix.shape[0])
+        if k == 0:
+            for values in result.values():
+                values.extend([] for _ in embeddings)
+            return result
+
+        queries = np.asarray(embeddings, dtype=np.float32)
+        queries /= np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+        scores = queries @ matrix.T
+
+        # Partial sort for the k best rows of every query, then order just those
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+        if rows is not None:
+            top = rows[top]
+
+        for row, row_scores in zip(top.tolist(), top_scores.tolist()):
+            result["ids"].append([ids[i] for i in row])
+            result["documents"].append([documents[i] for i in row])
+            result["metadatas"].append([metadatas[i] for i in row])
+            # Cosine distance, as reported by ChromaDB for collections using the cosine space
+            result["distances"].append([1.0 - score for score in row_scores])
+        return result
+
+    def version(self):
+        return _read_fingerprint(os.path.join(self.path, "manifest.json"))
+
+    def warm_up(self) -> None:
+        matrix = self._get_index()[0]
+        # Touch every page so the mapped file is resident before the first query
+        if matrix.size:
+            matrix.sum()
+
+    def close(self) -> None:
+        with self._lock:
+            self._index = None
+            self._fingerprint = None
+
+
+def create_backend(name: str) -> RetrievalBackend:
+    """
+    Returns the backend registered under the given RETRIEVAL_BACKEND name.
+    """
+    if name == "chroma":
+        return ChromaBackend()
+    if name == "numpy":
+        return NumpyBackend()
+    raise ValueError(f"Unknown retrieval backend: {name!r} (expected 'chroma' or 'numpy')")
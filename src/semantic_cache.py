@@ -0,0 +1,101 @@
+"""
+Semantic cache of retrieval results.
+
+Paraphrased queries ("book about Stoicism", "stoic philosophy book") have nearly identical
+embeddings and retrieve the same summary. The cache keeps the embeddings of recent queries
+in a small matrix next to their results; a new query whose embedding is within a cosine
+similarity threshold of a cached one reuses that result instead of querying the vector index.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+
+
+class SemanticCache:
+    """
+    LRU cache of retrieval results keyed by query embedding similarity.
+
+    Args:
+        capacity (int): Maximum number of cached queries
+        threshold (float): Minimum cosine similarity between a new query and a cached one to reuse its result
+
+    Results are tagged with the version of the index they came from; a lookup with a different
+    version empties the cache, so results never outlive a repopulated collection. The hits and
+    misses attributes count lookups since creation.
+    """
+
+    def __init__(self, capacity: int = 1024, threshold: float = 0.95):
+        self.capacity = capacity
+        self.threshold = threshold
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._vectors = None  # (capacity, dimensions) matrix of normalized query embeddings
+        self._entries = OrderedDict()  # slot -> result, least recently used first
+        self._free = list(range(capacity))  # Slots of the matrix not holding an entry
+        self._version = None
+
+    def _clear_locked(self) -> None:
+        self._entries.clear()
+        self._free = list(range(self.capacity))
+        if self._vectors is not None:
+            self._vectors[:] = 0.0
+
+    def lookup(self, embedding: list[float], version) -> Optional[object]:
+        """
+        Returns the cached result of the most similar earlier query, or None if none is close enough.
+
+        Args:
+            embedding (list[float]): Embedding of the new query
+            version: Current version of the vector index
+        """
+        with self._lock:
+            if version != self._version:
+                self._clear_locked()
+                self._version = version
+            if not self._entries:
+                self.misses += 1
+                return None
+
+            query = np.array(embedding, dtype=np.float32)
+            query /= max(float(np.linalg.norm(query)), 1e-12)
+            # Free slots hold zero vectors, so they never reach a positive threshold
+            scores = self._vectors @ query
+            slot = int(np.argmax(scores))
+            if scores[slot] < self.threshold or slot not in self._entries:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(slot)
+            self.hits += 1
+            return self._entries[slot]
+
+    def put(self, embedding: list[float], result: object, version) -> None:
+        """
+        Caches the result retrieved for a query embedding, evicting the least recently used entry when full.
+        """
+        with self._lock:
+            if version != self._version:
+                self._clear_locked()
+                self._version = version
+
+            query = np.asarray(embedding, dtype=np.float32)
+            if self._vectors is None:
+                self._vectors = np.zeros((self.capacity, query.shape[0]), dtype=np.float32)
+
+            if self._free:
+                slot = self._free.pop()
+            else:
+                slot, _ = self._entries.popitem(last=False)
+
+            self._vectors[slot] = query / max(float(np.linalg.norm(query)), 1e-12)
+            self._entries[slot] = result
+
+    def stats(self) -> dict:
+        """
+        Returns the hit and miss counters.
+        """
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
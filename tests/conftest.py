@@ -0,0 +1,8 @@
+"""
+Makes the modules in src/ importable from the tests, the way the scripts import each other.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
@@ -0,0 +1,33 @@
+import os
+
+import pytest
+
+os.environ.setdefault("OPENAI_API_KEY", "test")  # The client is created at import time
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app import app  # noqa: E402
+
+
+@pytest.mark.parametrize(
+    "where",
+    [
+        {"idx": {"$bad": 1}},
+        {"n": 1, "idx": "1"},
+        {"n": {"$gt": "a"}},
+        {"idx": {"$in": []}},
+        {"$or": [{"idx": "1"}]},
+    ],
+)
+def test_batch_rejects_invalid_where(where):
+    # No lifespan: validation fails before the vector database or OpenAI are touched
+    response = TestClient(app).post("/retrieve/batch", json={"queries": [{"query": "stoicism", "where": where}]})
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["loc"][-1] == "where"
+
+
+@pytest.mark.parametrize("query", ["", "x" * 5000])
+def test_rejects_empty_and_overlong_queries(query):
+    client = TestClient(app)
+    assert client.post("/retrieve", json={"query": query}).status_code == 422
+    assert client.post("/retrieve/batch", json={"queries": [{"query": query}]}).status_code == 422
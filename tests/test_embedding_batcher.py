@@ -0,0 +1,139 @@
+import asyncio
+
+import httpx
+import openai
+import pytest
+
+from embedding_batcher import EmbeddingBatcher
+from fake_embedding_server import FakeEmbeddingServer, fake_embedding
+
+DIMENSIONS = 8
+
+
+@pytest.fixture
+def server():
+    server = FakeEmbeddingServer(latency=0.0, dimensions=DIMENSIONS).start()
+    yield server
+    server.stop()
+
+
+def _close_to(a: list[float], b: list[float]) -> bool:
+    # The client may request base64 float32 vectors, so compare at float32 precision
+    return all(abs(x - y) < 1e-5 for x, y in zip(a, b)) and len(a) == len(b)
+
+
+def test_concurrent_embeds_share_one_call(server):
+    texts = [f"query {i}" for i in range(20)]
+
+    async def run():
+        async with openai.AsyncOpenAI(base_url=server.base_url, api_key="test") as client:
+            batcher = EmbeddingBatcher(client, "test-model", max_batch_size=64, max_wait=0.05)
+            return batcher, await asyncio.gather(*(batcher.embed(text) for text in texts))
+
+    batcher, embeddings = asyncio.run(run())
+
+    assert server.batch_sizes == [len(texts)]
+    assert (batcher.batches, batcher.items) == (1, len(texts))
+    for text, embedding in zip(texts, embeddings):
+        assert _close_to(embedding, fake_embedding(text, DIMENSIONS))
+
+
+def test_full_batch_flushes_without_waiting(server):
+    async def run():
+        async with openai.AsyncOpenAI(base_url=server.base_url, api_key="test") as client:
+            batcher = EmbeddingBatcher(client, "test-model", max_batch_size=4, max_wait=60.0)
+            return await asyncio.wait_for(asyncio.gather(*(batcher.embed(f"q{i}") for i in range(8))), 10)
+
+    assert len(asyncio.run(run())) == 8
+    assert server.batch_sizes == [4, 4]
+
+
+class _Embeddings:
+    def __init__(self, create):
+        self.create = create
+
+
+class _Client:
+    def __init__(self, create):
+        self.embeddings = _Embeddings(create)
+
+
+class _Item:
+    def __init__(self, index: int):
+        self.index = index
+        self.embedding = [float(index)]
+
+
+class _Response:
+    def __init__(self, data: list):
+        self.data = data
+
+
+def test_incomplete_response_fails_every_caller():
+    async def create(input, model):
+        return _Response([_Item(0)])  # Drops every input but the first
+
+    async def run():
+        batcher = EmbeddingBatcher(_Client(create), "test-model", max_wait=0.001)
+        return await asyncio.wait_for(
+            asyncio.gather(batcher.embed("a"), batcher.embed("b"), return_exceptions=True), 5
+        )
+
+    first, second = asyncio.run(run())
+    assert first == [0.0]
+    assert isinstance(second, KeyError)
+
+
+def test_api_error_fails_every_caller():
+    async def create(input, model):
+        raise RuntimeError("rate limited")
+
+    async def run():
+        batcher = EmbeddingBatcher(_Client(create), "test-model", max_wait=0.001)
+        return await asyncio.wait_for(
+            asyncio.gather(batcher.embed("a"), batcher.embed("b"), return_exceptions=True), 5
+        )
+
+    assert all(isinstance(result, RuntimeError) for result in asyncio.run(run()))
+
+
+def test_cancelled_call_cancels_waiting_callers():
+    async def create(input, model):
+        await asyncio.sleep(60)
+
+    async def run():
+        batcher = EmbeddingBatcher(_Client(create), "test-model", max_wait=0.001)
+        waiters = [asyncio.ensure_future(batcher.embed(text)) for text in ("a", "b")]
+        await asyncio.sleep(0.05)
+        for task in list(batcher._tasks):
+            task.cancel()
+        return await asyncio.wait_for(asyncio.gather(*waiters, return_exceptions=True), 5)
+
+    assert all(isinstance(result, asyncio.CancelledError) for result in asyncio.run(run()))
+
+
+def _bad_request() -> openai.BadRequestError:
+    response = httpx.Response(400, request=httpx.Request("POST", "https://api.openai.com/v1/embeddings"))
+    return openai.BadRequestError("invalid input", response=response, body=None)
+
+
+def test_bad_input_only_fails_its_own_caller():
+    calls = []
+
+    async def create(input, model):
+        calls.append(list(input))
+        if "" in input:
+            raise _bad_request()
+        return _Response([_Item(i) for i in range(len(input))])
+
+    async def run():
+        batcher = EmbeddingBatcher(_Client(create), "test-model", max_wait=0.001)
+        return await asyncio.wait_for(
+            asyncio.gather(batcher.embed("a"), batcher.embed(""), batcher.embed("b"), return_exceptions=True), 5
+        )
+
+    first, poisoned, second = asyncio.run(run())
+    assert first == [0.0] and second == [0.0]
+    assert isinstance(poisoned, openai.BadRequestError)
+    assert calls[0] == ["a", "", "b"]
+    assert sorted(calls[1:]) == [[""], ["a"], ["b"]]
@@ -0,0 +1,83 @@
+import pytest
+
+import embedding_cache
+from embedding_cache import EmbeddingCache, normalize_query
+
+MODEL = "test-model"
+
+
+class _Clock:
+    """
+    Stands in for time.time() so expiry can be tested without sleeping.
+    """
+
+    def __init__(self, now: float = 1_000_000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(embedding_cache.time, "time", clock)
+    return clock
+
+
+def test_keys_are_normalized():
+    cache = EmbeddingCache(None)
+    cache.put("  Stoic   PHILOSOPHY ", MODEL, [1.0])
+
+    assert normalize_query("  Stoic   PHILOSOPHY ") == "stoic philosophy"
+    assert cache.get("stoic philosophy", MODEL) == [1.0]
+    assert cache.get("stoic philosophy", "other-model") is None
+
+
+def test_memory_entries_expire(clock):
+    cache = EmbeddingCache(None, ttl=10)
+    cache.put("a", MODEL, [1.0])
+
+    clock.now += 9
+    assert cache.get("a", MODEL) == [1.0]
+    clock.now += 2
+    assert cache.get("a", MODEL) is None
+
+
+def test_disk_hits_survive_reopen(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = EmbeddingCache(path)
+    cache.put("a", MODEL, [0.5, -1.25])
+    cache.close()
+
+    reopened = EmbeddingCache(path)
+    assert reopened.get("A", MODEL) == [0.5, -1.25]
+    assert reopened.stats() == {"hits_memory": 0, "hits_disk": 1, "misses": 0}
+    reopened.close()
+
+
+def test_promoted_entry_keeps_original_expiry(tmp_path, clock):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = EmbeddingCache(path, ttl=10)
+    cache.put("a", MODEL, [1.0])
+    cache.close()
+
+    clock.now += 8
+    reopened = EmbeddingCache(path, ttl=10)
+    assert reopened.get("a", MODEL) == [1.0]  # Promoted to memory with 2 s left
+
+    clock.now += 3
+    assert reopened.get("a", MODEL) is None
+    assert reopened.stats() == {"hits_memory": 0, "hits_disk": 1, "misses": 1}
+    reopened.close()
+
+
+def test_counters(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite3"))
+    assert cache.get("a", MODEL) is None
+    cache.put("a", MODEL, [1.0])
+    assert cache.get("a", MODEL) == [1.0]
+    assert cache.get("a", MODEL) == [1.0]
+
+    assert cache.stats() == {"hits_memory": 2, "hits_disk": 0, "misses": 1}
+    cache.close()
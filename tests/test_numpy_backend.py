@@ -0,0 +1,83 @@
+import chromadb
+import numpy as np
+import pytest
+
+from retrieval_backends import NumpyBackend, export_numpy_index
+
+DIMENSIONS = 8
+
+
+@pytest.fixture
+def collection(tmp_path):
+    client = chromadb.PersistentClient(path=str(tmp_path / "chroma"))
+    return client.create_collection(name="numpy_test", metadata={"hnsw:space": "cosine"})
+
+
+def _add(collection, vectors: np.ndarray, start: int = 0) -> None:
+    ids = [str(i) for i in range(start, start + len(vectors))]
+    collection.add(
+        ids=ids,
+        embeddings=vectors.tolist(),
+        documents=[f"Summary {i}" for i in ids],
+        metadatas=[{"idx": i, "even": int(i) % 2 == 0} for i in ids],
+    )
+
+
+def _export(collection, tmp_path) -> NumpyBackend:
+    path = str(tmp_path / "numpy_index")
+    export_numpy_index(collection, path, page_size=7)  # Several pages
+    return NumpyBackend(path)
+
+
+def test_top_k_matches_brute_force(collection, tmp_path):
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((50, DIMENSIONS))
+    _add(collection, vectors)
+    backend = _export(collection, tmp_path)
+    queries = rng.standard_normal((3, DIMENSIONS))
+
+    res = backend.query(queries.tolist(), n_results=5)
+
+    unit = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    for row, query in enumerate(queries):
+        distances = 1 - unit @ (query / np.linalg.norm(query))
+        expected = np.argsort(distances)[:5]
+        assert res["ids"][row] == [str(i) for i in expected]
+        assert res["distances"][row] == pytest.approx(distances[expected].tolist(), abs=1e-5)
+        assert res["documents"][row] == [f"Summary {i}" for i in expected]
+
+
+def test_k_larger_than_matching_rows(collection, tmp_path):
+    _add(collection, np.random.default_rng(1).standard_normal((6, DIMENSIONS)))
+    backend = _export(collection, tmp_path)
+
+    res = backend.query([[1.0] * DIMENSIONS], n_results=10, where={"even": True})
+
+    assert sorted(res["ids"][0]) == ["0", "2", "4"]
+    assert res["distances"][0] == sorted(res["distances"][0])
+
+
+def test_empty_filter_result(collection, tmp_path):
+    _add(collection, np.random.default_rng(2).standard_normal((4, DIMENSIONS)))
+    backend = _export(collection, tmp_path)
+
+    res = backend.query([[1.0] * DIMENSIONS, [-1.0] * DIMENSIONS], n_results=3, where={"idx": "missing"})
+
+    assert res == {"ids": [[], []], "documents": [[], []], "metadatas": [[], []], "distances": [[], []]}
+
+
+def test_swapped_manifest_is_reloaded(collection, tmp_path):
+    vectors = np.eye(DIMENSIONS)[:2]
+    _add(collection, vectors)
+    backend = _export(collection, tmp_path)
+    # Orthogonal to every exported vector until the new one is exported
+    assert backend.query([np.eye(DIMENSIONS)[2].tolist()], n_results=1)["distances"][0][0] == pytest.approx(1.0)
+    version = backend.version()
+
+    _add(collection, np.eye(DIMENSIONS)[2:3], start=2)
+    export_numpy_index(collection, backend.path)
+
+    assert backend.version() != version
+    res = backend.query([np.eye(DIMENSIONS)[2].tolist()], n_results=1)
+    assert res["ids"] == [["2"]]
+    assert res["distances"][0][0] == pytest.approx(0.0, abs=1e-6)
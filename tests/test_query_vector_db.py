@@ -0,0 +1,111 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+import query_vector_db
+from embedding_cache import EmbeddingCache, normalize_query
+from retrieval_backends import RetrievalBackend, _matches
+
+# Unit vectors: "x" is closest to doc 0, "y" to doc 2, doc 1 sits in between
+DOCS = np.array([[1.0, 0.0], [0.8, 0.6], [0.0, 1.0]])
+QUERY_VECTORS = {"x": [1.0, 0.0], "y": [0.0, 1.0]}
+
+
+class _Backend(RetrievalBackend):
+    """
+    Exact search over DOCS that records every query it answers.
+    """
+
+    def __init__(self):
+        self.calls = []
+
+    def query(self, embeddings, n_results, where=None):
+        self.calls.append((len(embeddings), n_results, where))
+        res = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        rows = [i for i in range(len(DOCS)) if not where or _matches({"idx": str(i)}, where)]
+        for emb in embeddings:
+            distances = {i: 1 - float(DOCS[i] @ np.array(emb)) for i in rows}
+            top = sorted(rows, key=distances.get)[:n_results]
+            res["ids"].append([str(i) for i in top])
+            res["documents"].append([f"Summary {i}" for i in top])
+            res["metadatas"].append([{"idx": str(i)} for i in top])
+            res["distances"].append([distances[i] for i in top])
+        return res
+
+    def version(self):
+        return 0
+
+
+class _Item:
+    def __init__(self, index, embedding):
+        self.index = index
+        self.embedding = embedding
+
+
+class _Client:
+    """
+    Stand-in for openai.AsyncOpenAI that records the inputs of every embeddings call.
+    """
+
+    def __init__(self):
+        self.inputs = []
+        self.embeddings = self
+
+    async def create(self, input, model):
+        self.inputs.append(list(input))
+        data = [_Item(i, QUERY_VECTORS[normalize_query(text)]) for i, text in enumerate(input)]
+        return type("Response", (), {"data": data})
+
+
+@pytest.fixture
+def backend(monkeypatch):
+    backend = _Backend()
+    monkeypatch.setattr(query_vector_db, "_backend", backend)
+    monkeypatch.setattr(query_vector_db, "_embedding_cache", EmbeddingCache(None))
+    yield backend
+    query_vector_db.close_client()
+
+
+def _retrieve(queries):
+    client = _Client()
+    return client, asyncio.run(query_vector_db.retrieve_batch_async(queries, client))
+
+
+def test_each_query_is_trimmed_to_its_own_k(backend):
+    _, results = _retrieve([{"query": "x", "k": 1}, {"query": "y", "k": 3}])
+
+    assert backend.calls == [(2, 3, None)]  # One vector query asking for the largest k
+    assert results[0]["ids"] == ["0"]
+    assert results[1]["ids"] == ["2", "1", "0"]
+    assert results[1]["distances"] == sorted(results[1]["distances"])
+
+
+def test_min_similarity_drops_distant_results(backend):
+    _, results = _retrieve([{"query": "x", "k": 3, "min_similarity": 0.7}])
+
+    # Similarities are 1.0, 0.8 and 0.0, i.e. distances 0.0, 0.2 and 1.0
+    assert results[0]["ids"] == ["0", "1"]
+    assert results[0]["distances"] == pytest.approx([0.0, 0.2])
+
+
+def test_queries_sharing_a_filter_share_a_vector_query(backend):
+    _, results = _retrieve(
+        [
+            {"query": "x", "k": 1, "where": {"idx": {"$in": ["1", "2"]}}},
+            {"query": "y", "k": 1, "where": {"idx": "0"}},
+            {"query": "y", "k": 2, "where": {"idx": {"$in": ["1", "2"]}}},
+        ]
+    )
+
+    assert sorted(backend.calls, key=str) == sorted(
+        [(2, 2, {"idx": {"$in": ["1", "2"]}}), (1, 1, {"idx": "0"})], key=str
+    )
+    assert [r["ids"] for r in results] == [["1"], ["0"], ["2", "1"]]
+
+
+def test_spellings_of_one_query_are_embedded_once(backend):
+    client, results = _retrieve([{"query": "x", "k": 1}, {"query": "X ", "k": 1}])
+
+    assert client.inputs == [["x"]]
+    assert results[0] == results[1]
@@ -0,0 +1,76 @@
+import chromadb
+import pytest
+
+from retrieval_backends import _matches, validate_where
+
+METADATAS = [
+    {"idx": "1", "n": 1},
+    {"idx": "2", "n": 2.5},
+    {"idx": "3", "n": "x"},
+    {"idx": "4"},
+    {"idx": "5", "n": True},
+    {"idx": "6", "n": 0},
+    {"idx": "7", "n": "1"},
+    {"idx": "8", "n": 1.0},
+]
+
+FILTERS = [
+    ({"idx": "4"}, ["4"]),
+    ({"n": 1}, ["1", "8"]),
+    ({"n": 1.0}, ["1", "8"]),
+    ({"n": True}, ["5"]),
+    ({"n": "1"}, ["7"]),
+    ({"n": {"$eq": "x"}}, ["3"]),
+    ({"n": {"$ne": 1}}, ["2", "3", "4", "5", "6", "7"]),
+    ({"n": {"$ne": True}}, ["1", "2", "3", "4", "6", "7", "8"]),
+    ({"n": {"$gt": 0}}, ["1", "2", "8"]),
+    ({"n": {"$gte": 1}}, ["1", "2", "8"]),
+    ({"n": {"$lt": 1}}, ["6"]),
+    ({"n": {"$lte": 2.5}}, ["1", "2", "6", "8"]),
+    ({"n": {"$in": [1, 2]}}, ["1", "8"]),
+    ({"n": {"$in": ["x", "1"]}}, ["3", "7"]),
+    ({"n": {"$nin": [True]}}, ["1", "2", "3", "4", "6", "7", "8"]),
+    ({"$and": [{"n": {"$gte": 0}}, {"idx": {"$ne": "6"}}]}, ["1", "2", "8"]),
+    ({"$or": [{"n": "x"}, {"idx": "4"}]}, ["3", "4"]),
+    ({"$or": [{"$and": [{"n": {"$gt": 0}}, {"n": {"$lt": 2}}]}, {"n": False}]}, ["1", "8"]),
+]
+
+INVALID_FILTERS = [
+    {},
+    {"n": 1, "idx": "1"},
+    {"n": {"$bad": 1}},
+    {"n": {"$gt": "a"}},
+    {"n": {"$gt": True}},
+    {"n": {"$in": []}},
+    {"n": {"$in": [2.5, 0]}},
+    {"n": None},
+    {"$or": [{"n": 1}]},
+    {"$and": [{"n": 1}, {"n": {"$lte": False}}]},
+]
+
+
+def _numpy_ids(where: dict) -> list[str]:
+    validate_where(where)
+    return sorted(metadata["idx"] for metadata in METADATAS if _matches(metadata, where))
+
+
+@pytest.mark.parametrize("where,expected", FILTERS)
+def test_matches(where, expected):
+    assert _numpy_ids(where) == expected
+
+
+@pytest.mark.parametrize("where", INVALID_FILTERS)
+def test_invalid_filters_are_rejected(where):
+    with pytest.raises(ValueError):
+        validate_where(where)
+
+
+def test_matches_agrees_with_chroma(tmp_path):
+    collection = chromadb.PersistentClient(path=str(tmp_path)).create_collection("filters")
+    collection.add(
+        ids=[metadata["idx"] for metadata in METADATAS],
+        embeddings=[[1.0, 0.0]] * len(METADATAS),
+        metadatas=METADATAS,
+    )
+    for where, _ in FILTERS:
+        assert sorted(collection.get(where=where)["ids"]) == _numpy_ids(where), where
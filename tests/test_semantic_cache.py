@@ -0,0 +1,41 @@
+from semantic_cache import SemanticCache
+
+
+def _unit(i: int, dimensions: int = 4) -> list[float]:
+    # Orthogonal embeddings, so distinct queries never reuse each other's results
+    return [1.0 if j == i else 0.0 for j in range(dimensions)]
+
+
+def test_near_duplicate_query_reuses_result():
+    cache = SemanticCache(capacity=4, threshold=0.95)
+    cache.put([1.0, 0.0, 0.0, 0.0], "stoicism", version=1)
+
+    assert cache.lookup([0.99, 0.05, 0.0, 0.0], version=1) == "stoicism"
+    assert cache.lookup([0.7, 0.7, 0.0, 0.0], version=1) is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = SemanticCache(capacity=2, threshold=0.95)
+    cache.put(_unit(0), "a", version=1)
+    cache.put(_unit(1), "b", version=1)
+    assert cache.lookup(_unit(0), version=1) == "a"  # "b" is now the least recently used
+
+    cache.put(_unit(2), "c", version=1)
+
+    assert cache.lookup(_unit(1), version=1) is None
+    assert cache.lookup(_unit(0), version=1) == "a"
+    assert cache.lookup(_unit(2), version=1) == "c"
+    assert cache.stats()["size"] == 2
+
+
+def test_new_version_drops_cached_results():
+    cache = SemanticCache(capacity=2, threshold=0.95)
+    cache.put(_unit(0), "a", version=1)
+
+    assert cache.lookup(_unit(0), version=2) is None
+    assert cache.stats()["size"] == 0
+
+    # Results stored for the new version are served again
+    cache.put(_unit(0), "a2", version=2)
+    assert cache.lookup(_unit(0), version=2) == "a2"